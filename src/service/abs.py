@@ -2,7 +2,7 @@ from __future__ import annotations
 from enum import IntEnum
 import selectors
 from abc import ABC
-from typing import Set, Tuple
+from typing import Set, Tuple, Union
 
 
 class UnitType(IntEnum):
@@ -16,6 +16,8 @@ class ConnectionException(BaseException):
 
 
 class Connection(ABC):
+    __slots__ = ()
+
     def connect(self, selector: selectors.DefaultSelector) -> None:
         raise NotImplemented()
 
@@ -29,15 +31,17 @@ class Connection(ABC):
     def on_write_event(key: selectors.SelectorKey) -> None:
         if key.data.outb:
             sent = key.fileobj.send(key.data.outb)  # Should be ready to write
-            key.data.outb = key.data.outb[sent:]
+            del key.data.outb[:sent]
 
     def on_sdp(self, sdp):
         raise NotImplemented()
 
-    def on_video(self, frame: bytes, timestamp: int, sps: bytes, pps: bytes) -> None:
+    def on_video(self, frame: Union[bytes, memoryview], timestamp: int, sps: bytes, pps: bytes) -> None:
+        """frame may be a view of the source receive buffer, valid only during the call"""
         raise NotImplemented()
 
-    def on_audio(self, frame: bytes, timestamp: int) -> None:
+    def on_audio(self, frame: Union[bytes, memoryview], timestamp: int) -> None:
+        """frame may be a view of the source receive buffer, valid only during the call"""
         raise NotImplemented()
 
     def add_sink(self, connection: Connection, reg_key: Tuple[str, int]) -> None:
@@ -2,17 +2,20 @@ import logging
 import time
 from . import abs
 
+_IDR: int = int(abs.UnitType.IDR)
+_NS_PER_SECOND: int = 1000000000
+
 
 class Calculator:
     def __init__(self, period: int):
-        self._calc_period: int = period
-        self._start_time: float = time.time()
+        self._calc_period: int = period * _NS_PER_SECOND
+        self._start_time: int = time.monotonic_ns()
 
     def on_data(self, data: bytes):
         self._on_data(data)
-        timing: float = time.time()
+        timing: int = time.monotonic_ns()
         if timing - self._start_time > self._calc_period:
-            self._calculate(timing - self._start_time)
+            self._calculate((timing - self._start_time) / _NS_PER_SECOND)
             self._start_time = timing
 
     def _on_data(self, data: bytes):
@@ -56,7 +59,7 @@ class FpsCalculator(Calculator):
 
     def _on_data(self, data: bytes):
         self._frames_per_period += 1
-        if data[0] & 0x1f == abs.UnitType.IDR:
+        if data[0] & 0x1f == _IDR:
             self._keyframes_per_period += 1
 
     def _calculate(self, period: float):
@@ -1,5 +1,7 @@
+import functools
 import logging
 import selectors
+import struct
 from base64 import b64decode
 from enum import IntEnum
 from typing import Dict, List, Set, Tuple, Union
@@ -29,23 +31,69 @@ SoundSize: IntEnum = IntEnum('SoundSize', ('SND8', 'SND16'), start=0)
 SoundType: IntEnum = IntEnum('SoundType', ('MONO', 'STEREO'), start=0)
 AacPacketType: IntEnum = IntEnum('AacPacketType', ('SEQUENCE_HEADER', 'RAW'), start=0)
 
+# type+size(24), timestamp(24)+timestamp extended(8), stream id(24)
+_TAG_HEADER: struct.Struct = struct.Struct('>II3x')
+# tag header followed by frame type+codec id
+_VIDEO_TAG_HEADER: struct.Struct = struct.Struct('>II3xB')
+# video tag header followed by avc packet type, composition time(24)
+_AVC_TAG_HEADER: struct.Struct = struct.Struct('>II3xBB3x')
+# tag header followed by sound data, aac packet type
+_AUDIO_TAG_HEADER: struct.Struct = struct.Struct('>II3xBB')
+_TAG_SIZE: struct.Struct = struct.Struct('>I')
+
+# signature, version, flags(audio 4, video 1), header size
+_FLV_HEADER_VIDEO: bytes = b'\x46\x4c\x56\x01\x01\x00\x00\x00\x09'
+_FLV_HEADER_AUDIO_VIDEO: bytes = b'\x46\x4c\x56\x01\x05\x00\x00\x00\x09'
+
+# unsent bytes a sink may queue before its frames are dropped
+_MAX_OUTB: int = 4 << 20
+
+_IDR: int = int(abs.UnitType.IDR)
+_NON_IDR: int = int(abs.UnitType.NonIDR)
+
+# plain int shadows of the enums used per frame
+_TAG_AUDIO: int = int(TagType.AUDIO)
+_TAG_VIDEO: int = int(TagType.VIDEO)
+_FT_KEY: int = int(FrameType.KEY)
+_FT_INTER: int = int(FrameType.INTER)
+_APT_SEQUENCE_HEADER: int = int(AvcPacketType.SEQUENCE_HEADER)
+_APT_NALU: int = int(AvcPacketType.NALU)
+_AAC_RAW: int = int(AacPacketType.RAW)
+
+_AAC_FREQUENCY_INDEX: Dict[int, int] = {96000: 0,
+                                        88200: 1,
+                                        64000: 2,
+                                        48000: 3,
+                                        44100: 4,
+                                        32000: 5,
+                                        24000: 6,
+                                        22050: 7,
+                                        16000: 8,
+                                        12000: 9,
+                                        11025: 10,
+                                        8000: 11,
+                                        7350: 12
+                                        }
+
 
 class FlvHeader:
+    __slots__ = ('_data',)
+
     def __init__(self, a: bool = False):
-        self._data = bytearray(b'\x46\x4c\x56\x01\x01\x00\x00\x00\x09')
-        self._data[4] |= (a << 2)
+        self._data: bytes = _FLV_HEADER_AUDIO_VIDEO if a else _FLV_HEADER_VIDEO
 
     def __bytes__(self):
-        return bytes(self._data)
+        return self._data
 
 
 class FlvTag:
-    def __init__(self, tag_type: TagType, length: int, timestamp: int):
-        self._data = b''.join([tag_type.to_bytes(1, 'big'),
-                               length.to_bytes(3, 'big'),
-                               (timestamp & 0xffffff).to_bytes(3, 'big'),
-                               (timestamp >> 24).to_bytes(1, 'big'),
-                               b'\x00\x00\x00'])
+    __slots__ = ('_data',)
+
+    @staticmethod
+    def _pack(header: struct.Struct, tag_type: TagType, length: int, timestamp: int, *fields: int) -> bytes:
+        return header.pack((tag_type << 24) | length,
+                           ((timestamp & 0xffffff) << 8) | ((timestamp >> 24) & 0xff),
+                           *fields)
 
     def __len__(self):
         return len(self._data)
@@ -53,77 +101,90 @@ class FlvTag:
     def __bytes__(self):
         return self._data
 
+    def finalize(self) -> bytes:
+        """Returns the tag followed by its size, as it goes to the flv body"""
+        return self._data + _TAG_SIZE.pack(len(self._data))
+
 
 class VideoTag(FlvTag):
+    __slots__ = ()
+
     def __init__(self, frame_type: FrameType, length: int, timestamp: int):
-        super().__init__(TagType.VIDEO, length, timestamp)
-        self._data = b''.join([self._data,
-                               ((frame_type << 4) | 7).to_bytes(1, 'big')])
+        self._data = self._pack(_VIDEO_TAG_HEADER, _TAG_VIDEO, length, timestamp, (frame_type << 4) | 7)
 
 
 class AvcSequenceHeader(VideoTag):
+    __slots__ = ()
+
     def __init__(self, data: bytes):
-        super().__init__(FrameType.KEY, len(data) + 5, 0)
-        self._data = b''.join([self._data,
-                               AvcPacketType.SEQUENCE_HEADER.to_bytes(1, 'big'),
-                               b'\x00\x00\x00',
+        self._data = b''.join([self._pack(_AVC_TAG_HEADER, _TAG_VIDEO, len(data) + 5, 0,
+                                          (_FT_KEY << 4) | 7, _APT_SEQUENCE_HEADER),
                                data])
 
 
 class AvcNalUnit(VideoTag):
+    __slots__ = ()
+
     def __init__(self, frame_type: FrameType, data: bytes, timestamp: int):
-        super().__init__(frame_type, len(data) + 5, timestamp)
-        self._data = b''.join([self._data,
-                               AvcPacketType.NALU.to_bytes(1, 'big'),
-                               b'\x00\x00\x00',
+        self._data = b''.join([self._pack(_AVC_TAG_HEADER, _TAG_VIDEO, len(data) + 5, timestamp,
+                                          (frame_type << 4) | 7, _APT_NALU),
                                data])
 
+    @classmethod
+    def into(cls, buf: bytearray, frame_type: FrameType, timestamp: int, *units: bytes) -> None:
+        """Appends length prefixed units as one tag, followed by the tag size"""
+        length: int = sum(len(unit) for unit in units) + 4 * len(units) + 5
+        buf += cls._pack(_AVC_TAG_HEADER, _TAG_VIDEO, length, timestamp, (frame_type << 4) | 7, _APT_NALU)
+        for unit in units:
+            buf += _TAG_SIZE.pack(len(unit))
+            buf += unit
+        buf += _TAG_SIZE.pack(length + _TAG_HEADER.size)
+
 
 class AudioData:
+    __slots__ = ('_fmt', '_rate', '_size', '_type')
+
     def __init__(self, f: SoundFormat, r: SoundRate, s: SoundSize, t: SoundType):
         self._fmt: SoundFormat = f
         self._rate: SoundRate = r
         self._size: SoundSize = s
         self._type: SoundType = t
 
-    def __bytes__(self) -> bytes:
+    @property
+    def flags(self) -> int:
         return (((self._fmt & 15) << 4) |
                 ((self._rate & 3) << 2) |
                 ((self._size & 1) << 1) |
-                (self._type & 1)
-                ).to_bytes(1, 'big')
-
+                (self._type & 1))
 
-class AudioTag(FlvTag):
-    def __init__(self, sample: bytes, timestamp: int, data: AudioData, packet_type: AacPacketType):
-        super().__init__(TagType.AUDIO, len(sample) + 2, timestamp)
-        self._data = b''.join([self._data, bytes(data), packet_type.to_bytes(1, 'big'), sample])
+    def __bytes__(self) -> bytes:
+        return self.flags.to_bytes(1, 'big')
 
 
-class FlvBody:
-    def __init__(self, tag: FlvTag):
-        self._data: bytes = b''.join([bytes(tag), len(tag).to_bytes(4, 'big')])
+class AudioTag(FlvTag):
+    __slots__ = ()
 
-    def __bytes__(self) -> bytes:
-        return self._data
+    def __init__(self, sample: bytes, timestamp: int, data: AudioData, packet_type: AacPacketType):
+        self._data = b''.join([self._pack(_AUDIO_TAG_HEADER, _TAG_AUDIO, len(sample) + 2, timestamp,
+                                          data.flags, packet_type),
+                               sample])
 
 
 class Timestamp:
-    def __init__(self, frequency: float):
+    __slots__ = ('_value', '_clock_rate')
+
+    def __init__(self, frequency: int):
         self._value: Union[int, None] = None
-        self._aux: float = .0
-        self._clock_rate: float = frequency / 1000.
+        self._clock_rate: int = int(frequency)
 
     def get(self, timestamp: int) -> int:
+        """Milliseconds since the first timestamp, rounded down"""
         if self._value is None:
             self._value = timestamp
-        ts: float = (timestamp - self._value) / self._clock_rate
-        rc: int = int(ts)
-        self._aux += ts - rc
-        if self._aux > 1.:
-            self._aux -= 1
-            rc += 1
-        return rc
+        return (timestamp - self._value) * 1000 // self._clock_rate
+
+
+_AAC_AUDIO_DATA: AudioData = AudioData(SoundFormat.AAC, SoundRate.fr44KHz, SoundSize.SND16, SoundType.STEREO)
 
 
 class Connection(abs.Connection):
@@ -131,9 +192,11 @@ class Connection(abs.Connection):
         self._key: Union[selectors.SelectorKey, None] = None
         self._rtsp_source: Union[abs.Connection, None] = None
         self._avc_header: Union[AvcSequenceHeader, None] = None
-        self._timestamp: Dict[str, Union[Timestamp, None]] = {'video': None, 'audio': None}
+        self._video_timestamp: Union[Timestamp, None] = None
+        self._audio_timestamp: Union[Timestamp, None] = None
         self._sent_key = False
-        self._audio_data = AudioData(SoundFormat.AAC, SoundRate.fr44KHz, SoundSize.SND16, SoundType.STEREO)
+        self._audio_data = _AAC_AUDIO_DATA
+        self._recv_buffer: bytearray = bytearray(4096)
 
     def disconnect(self, need_to_remove: Set[abs.Connection]) -> None:
         if self._rtsp_source is not None:
@@ -144,22 +207,24 @@ class Connection(abs.Connection):
 
     def on_read_event(self, **kwargs) -> None:
         key: selectors.SelectorKey = kwargs.get('key')
-        data: bytes = key.fileobj.recv(1024)
-        if data:
-            logging.debug(f'{data.decode("utf-8")}')
+        size: int = key.fileobj.recv_into(self._recv_buffer)
+        if size:
+            data: bytes = bytes(memoryview(self._recv_buffer)[:size])
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(data.decode('utf-8', 'replace'))
             if self._key is None:
                 self._key = key
                 try:
-                    self._set_source(data.decode().split('\r\n'), key.data.addr, **kwargs)
+                    self._set_source(data.partition(b'\r\n')[0], key.data.addr, **kwargs)
                 except BaseException as e:
-                    key.data.outb = f'HTTP/1.0 400 Bad Request\r\nWarning: {e}\r\n\r\n'.encode()
+                    key.data.outb += f'HTTP/1.0 400 Bad Request\r\nWarning: {e}\r\n\r\n'.encode()
             return
         raise EOFError()
 
-    def _set_source(self, headers: List[str], reg_key: Tuple[str, int], **kwargs) -> None:
+    def _set_source(self, request_line: bytes, reg_key: Tuple[str, int], **kwargs) -> None:
         connections: Dict[Tuple[str, int], abs.Connection] = kwargs.get('connections')
-        if 'GET ' in headers[0]:
-            url: Url = Url(headers[0].split(' ')[1].lstrip('/'))
+        if request_line.startswith(b'GET '):
+            url: Url = Url(request_line.split(b' ')[1].decode('utf-8').lstrip('/'))
             if connections.get(url.address) is None:
                 self._rtsp_source = rtsp.Connection(url.address, rtsp.Source(url.credentials, url.content, None))
                 self._rtsp_source.add_sink(self, reg_key)
@@ -171,90 +236,81 @@ class Connection(abs.Connection):
 
     @staticmethod
     def _compile_avc_header(sps: bytes, pps: bytes) -> bytes:
-        return bytes(FlvBody(AvcSequenceHeader(b''.join([b'\x01', sps[1:4],
-                                                         b'\xff\xe1', len(sps).to_bytes(2, 'big'), sps,
-                                                         b'\x01', len(pps).to_bytes(2, 'big'), pps]))))
-
-    def _compile_aac_header(self, attrib: List[str]) -> bytes:
-        frq_idx: Dict[int, int] = {96000: 0,
-                                   88200: 1,
-                                   64000: 2,
-                                   48000: 3,
-                                   44100: 4,
-                                   32000: 5,
-                                   24000: 6,
-                                   22050: 7,
-                                   16000: 8,
-                                   12000: 9,
-                                   11025: 10,
-                                   8000: 11,
-                                   7350: 12
-                                   }
+        return AvcSequenceHeader(b''.join([b'\x01', sps[1:4],
+                                           b'\xff\xe1', len(sps).to_bytes(2, 'big'), sps,
+                                           b'\x01', len(pps).to_bytes(2, 'big'), pps])).finalize()
+
+    @staticmethod
+    def _compile_aac_header(attrib: List[str]) -> bytes:
         object_type: int = 2
         clock_rate = int(attrib[0])
         channels = int(attrib[1]) if len(attrib) > 1 else 1
-        idx: int = frq_idx.get(clock_rate, None) if frq_idx.get(clock_rate) else 15
-        self._timestamp['audio'] = Timestamp(clock_rate)
+        idx: int = _AAC_FREQUENCY_INDEX.get(clock_rate, 15)
         if idx == 15:
-            conf = bytes.fromhex(hex(((object_type & 0x1f) << 35) |
-                                     ((idx & 15) << 31) |
-                                     ((clock_rate & 0xffffff) << 7) |
-                                     ((channels & 15) << 3)
-                                     )[2:]
-                                 )
+            conf = (((object_type & 0x1f) << 35) |
+                    ((idx & 15) << 31) |
+                    ((clock_rate & 0xffffff) << 7) |
+                    ((channels & 15) << 3)
+                    ).to_bytes(5, 'big')
         else:
-            conf = bytes.fromhex(hex(((object_type & 0x1f) << 11) |
-                                     ((idx & 15) << 7) |
-                                     ((channels & 15) << 3)
-                                     )[2:]
-                                 )
-        return bytes(FlvBody(AudioTag(conf, 0, self._audio_data, AacPacketType.SEQUENCE_HEADER)))
+            conf = (((object_type & 0x1f) << 11) |
+                    ((idx & 15) << 7) |
+                    ((channels & 15) << 3)
+                    ).to_bytes(2, 'big')
+        return AudioTag(conf, 0, _AAC_AUDIO_DATA, AacPacketType.SEQUENCE_HEADER).finalize()
 
-    def on_sdp(self, sdp_: sdp.Sdp):
-        rc: List[bytes] = ["HTTP/1.0 200 OK\r\nContent-Type: video/x-flv\r\n\r\n".encode(),
-                           bytes(FlvHeader(sdp_.media('audio') is not None)),
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def _compile_preamble(has_audio: bool, fmtp: Union[str, None], rtpmap: Union[str, None]) -> bytes:
+        """HTTP reply and flv stream up to the first frame. Same for every sink of a source"""
+        rc: List[bytes] = [b'HTTP/1.0 200 OK\r\nContent-Type: video/x-flv\r\n\r\n',
+                           bytes(FlvHeader(has_audio)),
                            b'\x00\x00\x00\x00'
                            ]
-        if sdp_.media('video') and sdp_.media('video').attribute('fmtp'):
-            sprop = sdp_.media('video').attribute('fmtp').split('sprop-parameter-sets=')[1].split(';')[0]
+        if fmtp:
+            sprop = fmtp.split('sprop-parameter-sets=')[1].split(';')[0]
             sprop = sprop.split(',')
-            rc.append(self.__class__._compile_avc_header(b64decode(sprop[0]), b64decode(sprop[1])))
-            self._timestamp['video'] = Timestamp(90000.)
-        if sdp_.media('audio') and sdp_.media('audio').attribute('rtpmap'):
-            attrib: List[str] = sdp_.media('audio').attribute('rtpmap').split()[1].split('/')
+            rc.append(Connection._compile_avc_header(b64decode(sprop[0]), b64decode(sprop[1])))
+        if rtpmap:
+            attrib: List[str] = rtpmap.split()[1].split('/')
+            if attrib[0].upper() == 'MPEG4-GENERIC':
+                rc.append(Connection._compile_aac_header(attrib[1:]))
+        return b''.join(rc)
+
+    def on_sdp(self, sdp_: sdp.Sdp):
+        video: Union[sdp.MediaDescription, None] = sdp_.media('video')
+        audio: Union[sdp.MediaDescription, None] = sdp_.media('audio')
+        fmtp: Union[str, None] = video.attribute('fmtp') if video else None
+        rtpmap: Union[str, None] = audio.attribute('rtpmap') if audio else None
+        if fmtp:
+            self._video_timestamp = Timestamp(90000)
+        if rtpmap:
+            attrib: List[str] = rtpmap.split()[1].split('/')
             if attrib[0].upper() == 'MPEG4-GENERIC':
-                rc.append(self._compile_aac_header(attrib[1:]))
-        self._key.data.outb = b''.join(rc)
-
-    def on_video(self, frame: bytes, timestamp: int, sps: bytes, pps: bytes) -> None:
-        if frame[0] & 0x1F == abs.UnitType.IDR:
-            self._on_idr_frame(frame, self._timestamp['video'].get(timestamp), sps, pps)
-        elif frame[0] & 0x1f == abs.UnitType.NonIDR and self._sent_key:
-            self._on_nonidr_frame(frame, self._timestamp['video'].get(timestamp))
-
-    def on_audio(self, sample: bytes, timestamp: int) -> None:
-        rc: List[bytes] = [bytes(FlvBody(AudioTag(sample,
-                                                  self._timestamp['audio'].get(timestamp),
-                                                  self._audio_data,
-                                                  AacPacketType.RAW)))]
-        self._key.data.outb = b''.join(rc)
+                self._audio_timestamp = Timestamp(int(attrib[1]))
+        self._key.data.outb += self.__class__._compile_preamble(audio is not None, fmtp, rtpmap)
+
+    def on_video(self, frame: Union[bytes, memoryview], timestamp: int, sps: bytes, pps: bytes) -> None:
+        if len(self._key.data.outb) > _MAX_OUTB:
+            self._sent_key = False  # a stalled sink resumes from the next key frame
+            return
+        unit_type: int = frame[0] & 0x1f
+        if unit_type == _IDR:
+            self._on_idr_frame(frame, self._video_timestamp.get(timestamp), sps, pps)
+        elif unit_type == _NON_IDR and self._sent_key:
+            self._on_nonidr_frame(frame, self._video_timestamp.get(timestamp))
+
+    def on_audio(self, sample: Union[bytes, memoryview], timestamp: int) -> None:
+        if len(self._key.data.outb) > _MAX_OUTB:
+            return
+        self._key.data.outb += AudioTag(sample,
+                                        self._audio_timestamp.get(timestamp),
+                                        self._audio_data,
+                                        _AAC_RAW).finalize()
 
     def _on_idr_frame(self, frame: bytes, timestamp: int, sps: bytes, pps: bytes) -> None:
-        self._key.data.outb = bytes(FlvBody(AvcNalUnit(FrameType.KEY,
-                                                       b''.join([len(sps).to_bytes(4, 'big'), sps,
-                                                                 len(pps).to_bytes(4, 'big'), pps,
-                                                                 len(frame).to_bytes(4, 'big'), frame]
-                                                                ),
-                                                       timestamp
-                                                       )
-                                            )
-                                    )
+        AvcNalUnit.into(self._key.data.outb, _FT_KEY, timestamp, sps, pps, frame)
         self._sent_key = True
 
     def _on_nonidr_frame(self, frame: bytes, timestamp: int) -> None:
-        self._key.data.outb = bytes(FlvBody(AvcNalUnit(FrameType.INTER,
-                                                       b''.join([len(frame).to_bytes(4, 'big'), frame]),
-                                                       timestamp
-                                                       )
-                                            )
-                                    )
+        AvcNalUnit.into(self._key.data.outb, _FT_INTER, timestamp, frame)
@@ -2,13 +2,13 @@
 import logging
 import selectors
 import socket
+import struct
 import time
 import types
 from base64 import b64encode, b64decode
-from collections import namedtuple
 from enum import IntEnum
 from hashlib import md5
-from typing import Dict, List, Tuple, Union
+from typing import Callable, Dict, List, Tuple, Union
 from . import abs
 from . import calculator
 from . import sdp
@@ -29,17 +29,32 @@ InterleavedChannel: IntEnum = IntEnum('InterleavedChannel', ('VIDEO',
                                       )
 
 
-RtpInterleaved: namedtuple = namedtuple('RtpInterleaved', 'preamble channel size')
-RtpHeader: namedtuple = namedtuple('RtpHeader', 'version P X CC M pt cseq timestamp ssrc')
-UnitHeader: namedtuple = namedtuple('UnitHeader', 'f nri type')
-FUHeader: namedtuple = namedtuple('FUHeader', 's e r type')
+# channel, size. The '$' preamble is skipped
+_INTERLEAVED: struct.Struct = struct.Struct('>xBH')
+# rtp timestamp, at offset 4 of the rtp header
+_RTP_TIMESTAMP: struct.Struct = struct.Struct('>I')
+# NAL unit header, FU header
+_FU: struct.Struct = struct.Struct('BB')
+_FU_A: int = int(abs.UnitType.FU_A)
+_BUFFER_SIZE: int = 1 << 20
+_RECV_SIZE: int = 65536
+_SOCKET_RECV_BUFFER_SIZE: int = 4 << 20
+_MAX_RECV_PER_EVENT: int = 16  # bounds the drain so that sinks get their turn to write
+_NS_PER_SECOND: int = 1000000000
 
 
-class RtspException(BaseException):
+class RtspException(Exception):
     pass
 
 
 class Source:
+    __slots__ = ('credentials', 'content', '_content_base', '_fps_calculator', '_dump_name', '_ask_position',
+                 'sink_table', '_sequence', '_buffer', '_read_pos', '_write_pos', '_scan_offset',
+                 '_state', '_status', 'url', '_session', 'sdp', '_transport', 'range', '_authorization', 'ha1',
+                 'nonce', '_ha1_nonce_md5', '_digest', 'timestamp_delta', '_keepalive_period', '_last_keepalive',
+                 '_last_pos_request', '_keepalive', '_keepalive_bytes', '_timing', '_credentials_not_accepted',
+                 '_fu_frame', 'sps', 'pps')
+
     def __init__(self, **kwargs) -> None:
         self.credentials = kwargs.get('credentials')
         self.content: str = kwargs.get('content')
@@ -48,12 +63,15 @@ class Source:
         if kwargs.get('fps'):
             self._fps_calculator = calculator.FpsCalculator(kwargs.get('fps'))
         self._dump_name: str = kwargs.get('dump')
-        self._ask_position: int = kwargs.get('pos_period')
+        self._ask_position: int = (kwargs.get('pos_period') or 0) * _NS_PER_SECOND
         self.sink_table: Dict[Tuple[str, int], Connection] = {}
         self._sequence: int = 1
-        self._buffer: bytearray = bytearray()
-        self._interleaved: RtpInterleaved = RtpInterleaved('$', 0, 0)
+        self._buffer: bytearray = bytearray(_BUFFER_SIZE)
+        self._read_pos: int = 0
+        self._write_pos: int = 0
+        self._scan_offset: int = 0
         self._state: State = State.INITIAL
+        self._status: int = 0
         self.url: str = ''
         self._session: str = ''
         self.sdp: sdp.Sdp = sdp.Sdp()
@@ -62,14 +80,17 @@ class Source:
         self._authorization: list = ['', '']
         self.ha1: str = ''
         self.nonce: str = ''
+        self._ha1_nonce_md5 = md5()
+        self._digest: Dict[Tuple[str, str], str] = {}
         self.timestamp_delta: list = [0, 0]
-        self._timeout: int = 0
+        self._keepalive_period: Union[int, None] = None  # None while the session has no timeout
         self._last_keepalive: int = 0
-        self._last_pos_request: int = time.time()
+        self._last_pos_request: int = time.monotonic_ns()
         self._keepalive: str = ''
-        self._timing = time.time()
+        self._keepalive_bytes: bytes = b''
+        self._timing: int = time.monotonic_ns()
         self._credentials_not_accepted = 0
-        self._frame: bytearray = bytearray()
+        self._fu_frame: Union[bytearray, None] = None  # FU-A unit being reassembled
         self.sps: bytes = b''
         self.pps: bytes = b''
 
@@ -81,25 +102,44 @@ class Source:
                           f"CSeq: {self._sequence}\r\n" \
                           f"User-Agent: debug-cdn\r\n" \
                           f"{self._get_authorization('OPTIONS')}\r\n"
+        self._keepalive_bytes = self._keepalive.encode()
         logging.info(self._keepalive)
-        return self._keepalive.encode()
-
-    def on_stream(self, key: selectors.SelectorKey, data: bytes) -> None:
+        return self._keepalive_bytes
+
+    def receive(self, sock: socket.socket) -> memoryview:
+        """Receives from sock straight into the rtp buffer. Returns view of received data"""
+        if len(self._buffer) - self._write_pos < _RECV_SIZE:
+            pending: int = self._write_pos - self._read_pos
+            self._buffer[:pending] = self._buffer[self._read_pos:self._write_pos]
+            self._read_pos, self._write_pos = 0, pending
+        view: memoryview = memoryview(self._buffer)[self._write_pos:self._write_pos + _RECV_SIZE]
+        size: int = sock.recv_into(view)
+        self._write_pos += size
+        return view[:size]
+
+    def on_stream(self, key: selectors.SelectorKey, data: memoryview) -> None:
+        """Handles data just received into the rtp buffer"""
         if self._state == State.PLAYING:
-            self._on_rtp_data(data)
-            key.data.outb = self._on_additional_activity()
+            self._on_rtp_data()
+            key.data.outb += self._on_additional_activity()
         else:
+            # rtsp dialog is not kept in the rtp buffer
+            self._write_pos -= len(data)
+            data = bytes(data)
             try:
-                if self._session:
-                    reply_end = data.find(0x24)
-                else:
-                    reply_end = data.find(b'\x0d\x0a\x0d\x0a')
-                if reply_end != 0:
-                    key.data.outb = self._on_rtsp_dialog(data[:reply_end].decode('utf-8').split('\r\n'),
-                                                         data[reply_end + 4:])
-                elif reply_end >= 0 and self._session:
+                if self._session and data[0] == 0x24:
                     self._state = State.PLAYING
-                    self._on_rtp_data(data[reply_end:])
+                    self._write_pos += len(data)
+                    self._on_rtp_data()
+                    return
+                reply_end = data.find(b'\x0d\x0a\x0d\x0a')
+                if reply_end != 0:
+                    key.data.outb += self._on_rtsp_dialog(data[:reply_end], data[reply_end + 4:])
+                    if self._state == State.PLAYING and reply_end > 0 and data[reply_end + 4:reply_end + 5] == b'$':
+                        # rtp data sent right after the reply is still in the buffer
+                        self._read_pos = self._write_pos + reply_end + 4
+                        self._write_pos += len(data)
+                        self._on_rtp_data()
             except UnicodeDecodeError:
                 self._state = State.PLAYING
 
@@ -107,130 +147,135 @@ class Source:
         self._state: State = State.INITIAL
         self._session = ''
         self.timestamp_delta = [0, 0]
-        self._buffer.clear()
-
-    def _on_rtsp_dialog(self, headers: list, remains: bytes) -> bytes:
-        logging.critical('\n'.join(headers)+'\n')
-        self._set_status(headers[0])
+        self._read_pos = self._write_pos = self._scan_offset = 0
+        self._fu_frame = None
+
+    def _on_rtsp_dialog(self, reply: bytes, remains: bytes) -> bytes:
+        """Handles rtsp reply headers. Only the status line and handled headers are decoded"""
+        logging.critical(reply.decode('utf-8', 'replace').replace('\r\n', '\n') + '\n')
+        headers: List[bytes] = reply.split(b'\r\n')
+        self._set_status(headers[0].decode('utf-8'))
         rc = b''
         if not (self._status == 200 or self._status == 401):
             raise RtspException(f'Source {self.url} not found')
         for hdr in headers:
-            out_bytes: bytes = {
-                'CSeq': self._set_sequence,
-                'Public': self._ask_describe,
-                'Content-Base': self._set_content,
-                'Content-Length': self._set_content,
-                'Session': self._set_session,
-                'Transport': self._set_transport,
-                'WWW-Authenticate': self._set_authentication,
-                'Range': self._set_position
-            }.get(hdr.split(':')[0], lambda **h: b'')(header=hdr, body=remains)
-            if out_bytes:
-                rc = out_bytes
+            handler = Source._header_handlers.get(hdr.partition(b':')[0])
+            if handler:
+                out_bytes: bytes = handler(self, header=hdr.decode('utf-8'), body=remains)
+                if out_bytes:
+                    rc = out_bytes
         if self._state == State.SETUP:
             rc = self._ask_play()
         if rc:
             logging.info(rc.decode('utf-8'))
         return rc
 
-    def _on_rtp_data(self, data: bytes):
-        self._buffer += data
-        self._verify_rtp_data()
-        if not self._buffer:
-            return
-        while True:
-            interleaved: RtpInterleaved = RtpInterleaved(chr(self._buffer[0]),
-                                                         self._buffer[1],
-                                                         int.from_bytes(self._buffer[2:4], byteorder='big'))
-            logging.debug(interleaved)
-            if len(self._buffer) > interleaved.size + 8:
-                header: RtpHeader = RtpHeader((self._buffer[4] >> 6) & 3,
-                                              (self._buffer[4] >> 5) & 1,
-                                              (self._buffer[4] >> 4) & 1,
-                                              (self._buffer[4]) & 0xf,
-                                              (self._buffer[5] >> 7) & 1,
-                                              (self._buffer[5]) & 0x7f,
-                                              int.from_bytes(self._buffer[6:8], byteorder='big'),
-                                              int.from_bytes(self._buffer[8:12], byteorder='big'),
-                                              int.from_bytes(self._buffer[12:16], byteorder='big'))
-                if interleaved.channel == InterleavedChannel.VIDEO:
-                    unit: UnitHeader = UnitHeader(self._buffer[16] >> 7,
-                                                  (self._buffer[16] >> 5) & 3,
-                                                  (self._buffer[16]) & 0x1f)
-                    if unit.type == abs.UnitType.FU_A:
-                        fu_header: FUHeader = FUHeader(self._buffer[17] >> 7,
-                                                       (self._buffer[17] >> 6) & 1,
-                                                       (self._buffer[17] >> 5) & 1,
-                                                       (self._buffer[17]) & 0x1f)
-                        if fu_header.s:
-                            self._frame = ((unit.f << 7) | (unit.nri << 5) | fu_header.type).to_bytes(1, 'big')
-                        self._frame += self._buffer[18:interleaved.size + 4]
-                        if fu_header.e:
-                            self._on_video_frame_ready(header)
+    def _on_rtp_data(self):
+        while self._verify_rtp_data():
+            buffer: bytearray = self._buffer
+            position: int = self._read_pos
+            write_pos: int = self._write_pos
+            debug: bool = logging.getLogger().isEnabledFor(logging.DEBUG)
+            with memoryview(buffer) as view:
+                while write_pos - position >= _INTERLEAVED.size:
+                    if buffer[position] != 0x24:  # an rtsp reply in between the packets
+                        break
+                    channel, size = _INTERLEAVED.unpack_from(buffer, position)
+                    if debug:
+                        logging.debug('RtpInterleaved(preamble=%#x, channel=%d, size=%d)',
+                                      buffer[position], channel, size)
+                    if write_pos - position > size + 8:
+                        timestamp: int = _RTP_TIMESTAMP.unpack_from(buffer, position + 8)[0]
+                        end: int = position + size + 4
+                        if channel == InterleavedChannel.VIDEO:
+                            nal, fu = _FU.unpack_from(buffer, position + 16)
+                            if nal & 0x1f == _FU_A:
+                                if fu & 0x80:  # start
+                                    self._fu_frame = bytearray(((nal & 0xe0) | (fu & 0x1f),))
+                                if self._fu_frame is not None:  # fragments without a start are dropped
+                                    self._fu_frame.extend(view[position + 18:end])  # in place, amortized O(1)
+                                    if fu & 0x40:  # end
+                                        frame: bytearray = self._fu_frame
+                                        self._fu_frame = None
+                                        self._on_video_frame_ready(frame, timestamp)
+                            else:
+                                # a view of the rtp buffer, valid only during the call as sinks do not keep frames
+                                self._on_video_frame_ready(view[position + 16:end], timestamp)
+                        elif channel == InterleavedChannel.AUDIO:
+                            self._on_audio_frame_ready(view[position + 16:end], timestamp)
+                        position = end
                     else:
-                        self._frame = self._buffer[16:interleaved.size + 4]
-                        self._on_video_frame_ready(header)
-                elif interleaved.channel == InterleavedChannel.AUDIO:
-                    self._frame = self._buffer[16:interleaved.size + 4]
-                    self._on_audio_frame_ready(header)
-                self._buffer = self._buffer[interleaved.size + 4:]
-            else:
-                break
-
-    def _verify_rtp_data(self):
-        if self._buffer[0] != 0x24:
-            reply_end = self._buffer.find(b'\x0d\x0a\x0d\x0a')
+                        break
+            self._read_pos = position
+            if position == write_pos or buffer[position] == 0x24:
+                return
+
+    def _verify_rtp_data(self) -> bool:
+        """Handles rtsp reply in front of rtp data. Returns False while the reply is incomplete"""
+        if self._buffer[self._read_pos] != 0x24:
+            reply_end = self._buffer.find(b'\x0d\x0a\x0d\x0a', self._read_pos + self._scan_offset, self._write_pos)
+            if reply_end < 0 and self._write_pos - self._read_pos < _RECV_SIZE:
+                # the rest of the reply is still to come, do not rescan what is already scanned
+                self._scan_offset = max(0, self._write_pos - self._read_pos - 3)
+                return False
+            self._scan_offset = 0
             if reply_end >= 0:
-                rtsp_reply_end: int = self._buffer.find(b'\x24', reply_end + 4)
+                rtsp_reply_end: int = self._buffer.find(b'\x24', reply_end + 4, self._write_pos)
                 if rtsp_reply_end > 0:
-                    self._on_rtsp_dialog(self._buffer[:reply_end].decode('utf-8').split('\r\n'),
+                    self._on_rtsp_dialog(bytes(self._buffer[self._read_pos:reply_end]),
                                          self._buffer[reply_end + 4:rtsp_reply_end])
-                    self._buffer = self._buffer[rtsp_reply_end:]
+                    self._read_pos = rtsp_reply_end
                 else:
-                    self._on_rtsp_dialog(self._buffer[:reply_end].decode('utf-8').split('\r\n'))
-                    self._buffer = b''
+                    self._on_rtsp_dialog(bytes(self._buffer[self._read_pos:reply_end]),
+                                         self._buffer[reply_end + 4:self._write_pos])
+                    self._read_pos = self._write_pos = 0
             else:
-                self._buffer = b''
-
-    def _on_video_frame_ready(self, header: RtpHeader):
-        if self._frame[0] & 0x1f == SequenceSetType.SPS:
-            self.sps = self._frame
-        elif self._frame[0] & 0x1f == SequenceSetType.PPS:
-            self.pps = self._frame
+                self._read_pos = self._write_pos = 0
+        return True
+
+    def _on_video_frame_ready(self, frame: Union[bytearray, memoryview], timestamp: int):
+        if frame[0] & 0x1f == SequenceSetType.SPS:
+            self.sps = bytes(frame)
+        elif frame[0] & 0x1f == SequenceSetType.PPS:
+            self.pps = bytes(frame)
         if self.sps and self.pps:
             for sink in self.sink_table.values():
-                sink.on_video(self._frame, header.timestamp, self.sps, self.pps)
-        self._initialize_timestamp_set(header)
-        logging.info(f'{hex(self._frame[0])} '
-                     f'{header.timestamp} '
-                     f'{header.timestamp - self.timestamp_delta[1]} '
-                     f'{int((time.time() - self._timing) * 1000)}')
-        self.timestamp_delta[1] = header.timestamp
-        self._timing = time.time()
+                sink.on_video(frame, timestamp, self.sps, self.pps)
+        self._initialize_timestamp_set(timestamp)
+        now: int = time.monotonic_ns()
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info(f'{hex(frame[0])} '
+                         f'{timestamp} '
+                         f'{timestamp - self.timestamp_delta[1]} '
+                         f'{(now - self._timing) // 1000000}')
+        self.timestamp_delta[1] = timestamp
+        self._timing = now
         if self._fps_calculator:
-            self._fps_calculator.on_data(self._frame)
+            self._fps_calculator.on_data(frame)
 
-    def _on_audio_frame_ready(self, header: RtpHeader):
+    def _on_audio_frame_ready(self, frame: memoryview, timestamp: int):
         # TODO parse AU headers in 4 bytes
+        sample: memoryview = frame[4:]
         for sink in self.sink_table.values():
-            sink.on_audio(self._frame[4:], header.timestamp)
+            sink.on_audio(sample, timestamp)
 
     def _on_additional_activity(self) -> bytes:
-        rc: List[bytes] = []
-        if self._timeout and time.time() - self._last_keepalive > self._timeout - 3:
-            self._last_keepalive = time.time()
-            rc.append(self._keepalive.encode())
-            logging.critical(rc[-1].decode('utf-8'))
-        if self._ask_position and time.time() - self._last_pos_request > self._ask_position:
-            self._last_pos_request = time.time()
-            rc.append(self._get_parameter(parameter='position'))
-            logging.critical(rc[-1].decode('utf-8'))
-        return b''.join(rc)
-
-    def _initialize_timestamp_set(self, header: RtpHeader):
+        rc: bytes = b''
+        now: int = time.monotonic_ns()
+        if self._keepalive_period is not None and now - self._last_keepalive > self._keepalive_period:
+            self._last_keepalive = now
+            rc = self._keepalive_bytes
+            logging.critical(self._keepalive)
+        if self._ask_position and now - self._last_pos_request > self._ask_position:
+            self._last_pos_request = now
+            position: bytes = self._get_parameter(parameter='position')
+            rc += position
+            logging.critical(position.decode('utf-8'))
+        return rc
+
+    def _initialize_timestamp_set(self, timestamp: int):
         if not self.timestamp_delta[0]:
-            self.timestamp_delta = [header.timestamp, header.timestamp]
+            self.timestamp_delta = [timestamp, timestamp]
 
     def _set_status(self, header: str) -> None:
         self._status = int(header.split()[1])
@@ -246,18 +291,20 @@ class Source:
             logging.info(body.decode("utf-8"))
             self._content_base = kwargs.get('header').split()[1]
         self.sdp.parse(body.decode('utf-8'))
-        if not self.sdp.media('video') or not self.sdp.media('video').attribute('control'):
+        video: sdp.MediaDescription = self.sdp.media('video')
+        control: Union[str, None] = video.attribute('control') if video else None
+        if not control:
             raise RtspException(f'invalid SDP: \n{self.sdp}')
         for sink in self.sink_table.values():
             sink.on_sdp(self.sdp)
-        control: str = self.sdp.media('video').attribute('control')
-        if self.sdp.media('video').attribute('fmtp'):
-            sprop = self.sdp.media('video').attribute('fmtp').split('sprop-parameter-sets=')[1].split(';')[0]
+        fmtp: Union[str, None] = video.attribute('fmtp')
+        if fmtp:
+            sprop = fmtp.split('sprop-parameter-sets=')[1].split(';')[0]
             sprop = sprop.split(',')
             self.sps = b64decode(sprop[0])
             self.pps = b64decode(sprop[1])
         if not self.range:
-            range_hdr = self.sdp.media('video').attribute('range')
+            range_hdr = video.attribute('range')
             if range_hdr:
                 self.range = range_hdr.split('=')[1].split('-')
         if not self._content_base:
@@ -278,8 +325,10 @@ class Source:
             if ';' in self._session:
                 l: list = self._session.split(';')
                 self._session = l[0]
-                self._timeout = [int(x.split('=')[1]) for x in l[1:] if 'timeout' in x][0]
-                self._last_keepalive = time.time()
+                timeout: int = [int(x.split('=')[1]) for x in l[1:] if 'timeout' in x][0]
+                # 3 seconds ahead of the timeout, half of it for short timeouts
+                self._keepalive_period = max((timeout - 3) * _NS_PER_SECOND, timeout * _NS_PER_SECOND // 2)
+                self._last_keepalive = time.monotonic_ns()
         else:
             self._state = State.PLAYING
 
@@ -324,6 +373,8 @@ class Source:
                         params['realm'] + ':' +
                         self.credentials[1]).encode('utf-8')).hexdigest()
         self.nonce = params['nonce']
+        self._ha1_nonce_md5 = md5((self.ha1 + ':' + self.nonce + ':').encode('utf-8'))  # copied per response
+        self._digest.clear()
         self._authorization[1] = f'Authorization: Digest username="{self.credentials[0]}",' \
                                  f' realm="{params["realm"]}",' \
                                  f' nonce="{self.nonce}",' \
@@ -338,7 +389,7 @@ class Source:
 
     def _set_position(self, **kwargs) -> bytes:
         # clock: str = kwargs.get('header').split()[1].split('=')[1]
-        logging.critical(f'on position time: {time.time() - self._last_pos_request}')
+        logging.critical(f'on position time: {(time.monotonic_ns() - self._last_pos_request) / _NS_PER_SECOND}')
         return b''
 
     def _ask_describe(self, **kwargs) -> bytes:
@@ -373,20 +424,41 @@ class Source:
 
     def _get_authorization(self, method):
         if self._authorization[1]:
-            ha2 = md5((method + ':' + self.url).encode('utf-8')).hexdigest()
-            response: str = md5((self.ha1 + ':' + self.nonce + ':' + ha2).encode('utf-8')).hexdigest()
-            return ''.join([self._authorization[1], response, '"\r\n'])
+            # without qop the digest response only depends on method and uri until the next nonce
+            authorization: str = self._digest.get((method, self.url))
+            if authorization is None:
+                ha2: str = md5((method + ':' + self.url).encode('utf-8')).hexdigest()
+                hasher = self._ha1_nonce_md5.copy()
+                hasher.update(ha2.encode('utf-8'))
+                response: str = hasher.hexdigest()
+                authorization = self._digest[(method, self.url)] = ''.join([self._authorization[1], response, '"\r\n'])
+            return authorization
         return self._authorization[0]
 
+    _header_handlers: Dict[bytes, Callable[..., Union[bytes, None]]] = {
+        b'CSeq': _set_sequence,
+        b'Public': _ask_describe,
+        b'Content-Base': _set_content,
+        b'Content-Length': _set_content,
+        b'Session': _set_session,
+        b'Transport': _set_transport,
+        b'WWW-Authenticate': _set_authentication,
+        b'Range': _set_position
+    }
+
 
 class Connection(abs.Connection):
     """Class to connect to stream source"""
+    __slots__ = ('_address', '_proto', '_br_calculator', '_stream_socket')
+
     def __init__(self, address, proto, br: Union[int, None]) -> None:
         self._address: Tuple[str, int] = address
         self._proto = proto
         self._br_calculator: Union[calculator.BitrateCalculator, None] = \
             calculator.BitrateCalculator(br) if br else None
         self._stream_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._stream_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._stream_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _SOCKET_RECV_BUFFER_SIZE)
 
     def __repr__(self):
         return f'{self.__class__.__name__}(ip {self._address[0]} port {self._address[1]})'
@@ -401,16 +473,23 @@ class Connection(abs.Connection):
                           selectors.EVENT_READ | selectors.EVENT_WRITE,
                           types.SimpleNamespace(addr=self._address,
                                                 inb=b'',
-                                                outb=self._proto.stream_request(self._address[0], self._address[1])))
+                                                outb=bytearray(self._proto.stream_request(self._address[0],
+                                                                                          self._address[1]))))
 
     def on_read_event(self, **kwargs):
         key: selectors.SelectorKey = kwargs.get('key')
-        data: bytes = key.fileobj.recv(1024)
-        if self._br_calculator:
-            self._br_calculator.on_data(data)
-        if data:
-            return self._proto.on_stream(key, data)
-        raise EOFError()
+        for _ in range(_MAX_RECV_PER_EVENT):
+            try:
+                data: memoryview = self._proto.receive(key.fileobj)
+            except BlockingIOError:
+                return
+            if not data:
+                raise EOFError()
+            if self._br_calculator:
+                self._br_calculator.on_data(data)
+            self._proto.on_stream(key, data)
+            if len(data) < _RECV_SIZE:  # socket is drained
+                return
 
     def add_sink(self, connection: abs.Connection, reg_key: Tuple[str, int]) -> None:
         if not self._proto.sdp.empty():
@@ -1,5 +1,5 @@
 from collections import namedtuple
-from typing import Dict, List, Tuple, Union
+from typing import Callable, Dict, List, Tuple, Union
 
 
 Origin: namedtuple = namedtuple('Origin', 'username session_id version network_type address_type address')
@@ -30,24 +30,10 @@ class SessionDescription:
         lines_parsed: int = 0
         try:
             for line in description:
-                d: List[str] = line.split('=')
-                {
-                    'v': self._set_proto_version,
-                    'o': self._set_origin,
-                    's': self._set_session_name,
-                    'i': self._set_session_info,
-                    'u': self._set_uri_of_description,
-                    'e': self._set_email_address,
-                    'p': self._set_phone_number,
-                    'c': self._set_connection_info,
-                    'b': self._set_bandwidth_info,
-                    't': self._set_session_active_time,
-                    'r': self._set_repeat_times,
-                    'z': self._set_timezone_adjustments,
-                    'k': self._set_encryption_key,
-                    'a': self._set_attribute_line,
-                    'm': self._on_media,
-                }.get(d[0], lambda x: None)('='.join(d[1:]))
+                kind, _, value = line.partition('=')
+                handler = SessionDescription._line_handlers.get(kind)
+                if handler:
+                    handler(self, value)
                 lines_parsed += 1
         except DescriptionException:
             pass
@@ -129,12 +115,30 @@ class SessionDescription:
         self._encryption_key = value
 
     def _set_attribute_line(self, value: str):
-        l: List[str, str] = value.split(':')
-        self._attributes[l[0]] = l[1]
+        key, _, attribute = value.partition(':')
+        self._attributes[key] = attribute
 
     def _on_media(self, value: str):
         raise DescriptionException
 
+    _line_handlers: Dict[str, Callable[..., None]] = {
+        'v': _set_proto_version,
+        'o': _set_origin,
+        's': _set_session_name,
+        'i': _set_session_info,
+        'u': _set_uri_of_description,
+        'e': _set_email_address,
+        'p': _set_phone_number,
+        'c': _set_connection_info,
+        'b': _set_bandwidth_info,
+        't': _set_session_active_time,
+        'r': _set_repeat_times,
+        'z': _set_timezone_adjustments,
+        'k': _set_encryption_key,
+        'a': _set_attribute_line,
+        'm': _on_media,
+    }
+
 
 class MediaDescription:
     def __init__(self):
@@ -149,15 +153,10 @@ class MediaDescription:
         lines_parsed: int = 0
         try:
             for line in description:
-                d: List[str] = line.split('=')
-                {
-                    'm': self._set_media,
-                    'i': self._set_title,
-                    'c': self._set_connection_info,
-                    'b': self._set_bandwidth_info,
-                    'k': self._set_encryption_key,
-                    'a': self._set_attribute_line,
-                }.get(d[0], lambda x: None)('='.join(d[1:]))
+                kind, _, value = line.partition('=')
+                handler = MediaDescription._line_handlers.get(kind)
+                if handler:
+                    handler(self, value)
                 lines_parsed += 1
         except DescriptionException:
             pass
@@ -204,8 +203,17 @@ class MediaDescription:
         self._encryption_key = value
 
     def _set_attribute_line(self, value: str):
-        l: List[str, str] = value.split(':')
-        self._attributes[l[0]] = l[1]
+        key, _, attribute = value.partition(':')
+        self._attributes[key] = attribute
+
+    _line_handlers: Dict[str, Callable[..., None]] = {
+        'm': _set_media,
+        'i': _set_title,
+        'c': _set_connection_info,
+        'b': _set_bandwidth_info,
+        'k': _set_encryption_key,
+        'a': _set_attribute_line,
+    }
 
 
 class Sdp:
@@ -68,28 +68,46 @@ class Service:
             try:
                 for key, mask in self._selector.select(timeout=.01):
                     if key.data is None:
-                        sock, address = key.fileobj.accept()
-                        sock.setblocking(False)
-                        self._selector.register(sock,
-                                                selectors.EVENT_READ | selectors.EVENT_WRITE,
-                                                types.SimpleNamespace(addr=address, inb=b'', outb=b''))
-                        self._connections[address] = FlvConnection()
-                        logging.debug(f'new connection from {address}')
+                        self._accept(key.fileobj)
                     else:
                         try:
                             self._on_event(key, mask, need_to_remove)
                         except KeyboardInterrupt:
                             break
                         except BaseException as e:  # noqa # pylint: disable=bare-except
-                            logging.error(f'Exception: {e}')
+                            logging.error('Exception: %s', e)
                             self._selector.unregister(key.fileobj)
                             key.fileobj.close()
                             self._connections[key.data.addr].disconnect(need_to_remove)
                             self._connections.pop(key.data.addr, None)
-                            logging.debug(f'connection to {key.data.addr} closed')
+                            logging.debug('connection to %s closed', key.data.addr)
+                self._update_write_interest()
             except KeyboardInterrupt:
                 break
 
+    def _accept(self, accept_sock: socket.socket) -> None:
+        """Accepts all pending connections"""
+        while True:
+            try:
+                sock, address = accept_sock.accept()
+            except BlockingIOError:
+                break
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._selector.register(sock,
+                                    selectors.EVENT_READ,
+                                    types.SimpleNamespace(addr=address, inb=b'', outb=bytearray()))
+            self._connections[address] = FlvConnection()
+            logging.debug('new connection from %s', address)
+
+    def _update_write_interest(self) -> None:
+        """Asks for write events only on sockets with pending output, idle sockets do not wake the loop"""
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                events: int = selectors.EVENT_READ | selectors.EVENT_WRITE if key.data.outb else selectors.EVENT_READ
+                if key.events != events:
+                    self._selector.modify(key.fileobj, events, key.data)
+
     def _on_event(self, key, mask, need_to_remove: Set[Connection]) -> None:
         """Manages event read/write on socket"""
         connect = self._connections.get(key.data.addr, None)
@@ -115,16 +133,10 @@ def run():
     parser.add_argument('-loglevel',
                         type=str,
                         default='info',
+                        choices=('critical', 'error', 'warning', 'info', 'debug'),
                         help='logging level (critical|error|warning|info|debug def. info)')
     args: argparse.Namespace = parser.parse_args()
-    level = {
-        'critical': lambda: logging.CRITICAL,
-        'error': lambda: logging.ERROR,
-        'warning': lambda: logging.WARNING,
-        'info': lambda: logging.INFO,
-        'debug': lambda: logging.DEBUG,
-    }.get(args.loglevel, logging.NOTSET)()
-    logging.getLogger().setLevel(level)
+    logging.getLogger().setLevel(args.loglevel.upper())
     try:
         Service(args).run(args.port)
     except BaseException as e:
@@ -1,6 +1,6 @@
 import logging
-import re
-from typing import List, Tuple
+from typing import Tuple
+from urllib.parse import urlsplit, SplitResult
 
 
 class UrlException(BaseException):
@@ -9,22 +9,19 @@ class UrlException(BaseException):
 
 class Url:
     def __init__(self, url):
-        pattern: List[str] = [r'(?P<proto>\w{4})://',
-                              r'(?P<auth>[\w]+:[\w%<]+@)?',
-                              r'(?P<ip>[\d]{1,3}\.[\d]{1,3}\.[\d]{1,3}\.[\d]{1,3})',
-                              r'(?P<port>:[\d]{3,6})?',
-                              r'(?P<content>.*)']
-        m = re.search(''.join(pattern), url)
-        if not m:
-            pattern[2] = r'(?P<ip>[\w\.]+)'
-            m = re.search(''.join(pattern), url)
-            if not m or m['proto'] != 'rtsp':
-                raise UrlException(f'invalid url {url}')
-        port: int = int(m['port'][1:]) if m['port'] else 554
-        self.address: Tuple[str, int] = (m['ip'], port)
-        self.content: str = m['content']
+        if '://' not in url:
+            url = 'rtsp://' + url
+        try:
+            parts: SplitResult = urlsplit(url)
+            port: int = parts.port or 554
+        except ValueError:
+            raise UrlException(f'invalid url {url}')
+        if parts.scheme != 'rtsp' or not parts.hostname:
+            raise UrlException(f'invalid url {url}')
+        self.address: Tuple[str, int] = (parts.hostname, port)
+        self.content: str = url[len(parts.scheme) + 3 + len(parts.netloc):]
         self.credentials: Tuple[str, ...] = tuple()
         self.dump: str = f'rtsp_{self.address[0]}_{self.address[1]}_{self.content}.dump'.replace('/', '_')
-        if m['auth']:
-            self.credentials = tuple(m['auth'][:-1].split(':'))
+        if parts.username:
+            self.credentials = (parts.username, parts.password or '')
         logging.info(f'credentials: {self.credentials} address: {self.address} content: {self.content}')
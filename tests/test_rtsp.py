@@ -0,0 +1,95 @@
+import os
+import struct
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from service import rtsp  # noqa: E402
+
+
+def _interleaved(channel: int, payload: bytes) -> bytes:
+    body = struct.pack('>BBHII', 0x80, 96, 0, 1000, 0) + payload
+    return b'$' + bytes([channel]) + struct.pack('>H', len(body)) + body
+
+
+class _Socket:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def recv_into(self, buffer) -> int:
+        size = min(len(buffer), len(self._data))
+        buffer[:size] = self._data[:size]
+        self._data = self._data[size:]
+        return size
+
+
+class _Sink:
+    def __init__(self):
+        self.video = []
+        self.audio = []
+
+    def on_video(self, frame, timestamp, sps, pps):
+        self.video.append(bytes(frame))
+
+    def on_audio(self, frame, timestamp):
+        self.audio.append(bytes(frame))
+
+
+class RtpDataTest(unittest.TestCase):
+    def setUp(self):
+        self.source = rtsp.Source(credentials=(), content='/', fps=0, dump='', pos_period=0)
+        self.source.sps, self.source.pps = b'\x67\x42\x00\x1f', b'\x68\xce\x3c\x80'
+        self.sink = _Sink()
+        self.source.sink_table[('127.0.0.1', 1)] = self.sink
+        self.source._state = rtsp.State.PLAYING
+        self.key = types.SimpleNamespace(data=types.SimpleNamespace(outb=bytearray()))
+
+    def _stream(self, data: bytes):
+        sock = _Socket(data)
+        while True:
+            view = self.source.receive(sock)
+            if not view:
+                break
+            self.source.on_stream(self.key, view)
+
+    def test_audio_between_fu_a_fragments(self):
+        # the last packet is held back until more data arrives, so a trailing audio packet flushes the unit
+        self._stream(_interleaved(0, b'\x7c\x85' + b'\x11' * 100) +
+                     _interleaved(2, b'\x00\x10\x00\x40' + b'\xaa' * 8) +
+                     _interleaved(0, b'\x7c\x45' + b'\x22' * 100) +
+                     _interleaved(2, b'\x00\x10\x00\x40' + b'\xbb' * 8) +
+                     _interleaved(2, b'\x00\x10\x00\x40' + b'\xcc' * 8))
+        self.assertEqual(self.sink.video, [b'\x65' + b'\x11' * 100 + b'\x22' * 100])
+        self.assertEqual(self.sink.audio, [b'\xaa' * 8, b'\xbb' * 8])
+
+    def test_fu_a_continuation_without_start_is_dropped(self):
+        self._stream(_interleaved(0, b'\x7c\x45' + b'\x22' * 100) +
+                     _interleaved(2, b'\x00\x10\x00\x40' + b'\xaa' * 8) +
+                     _interleaved(2, b'\x00\x10\x00\x40' + b'\xbb' * 8))
+        self.assertEqual(self.sink.video, [])
+        self.assertEqual(self.sink.audio, [b'\xaa' * 8])
+
+    def test_reply_between_rtp_packets(self):
+        # read as interleaved data, the reply would claim channel 0x54 and 0x5350 bytes of payload
+        units = [bytes([0x41, n]) + b'\x33' * 1000 for n in range(24)]
+        self._stream(_interleaved(0, units[0]) +
+                     b'RTSP/1.0 200 OK\r\nCSeq: 5\r\n\r\n' +
+                     b''.join(_interleaved(0, unit) for unit in units[1:]) +
+                     _interleaved(2, b'\x00\x10\x00\x40' + b'\xaa' * 8))
+        self.assertEqual(self.sink.video, units)
+
+
+class KeepaliveTest(unittest.TestCase):
+    def test_short_session_timeout(self):
+        source = rtsp.Source(credentials=(), content='/', fps=0, dump='', pos_period=0)
+        keepalive: bytes = source.stream_request('127.0.0.1', 554)
+        source._set_session(header='Session: 1234;timeout=3')
+        self.assertEqual(source._on_additional_activity(), b'')
+        source._last_keepalive -= 2 * 1000000000
+        self.assertEqual(source._on_additional_activity(), keepalive)
+
+
+if __name__ == '__main__':
+    unittest.main()